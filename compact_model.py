@@ -0,0 +1,69 @@
+#! /usr/bin/env python
+"""
+Rewrites model database into fresh file, optionally pruning it. Run it
+offline, while nothing else uses source database.
+"""
+
+import os
+from glob import glob
+from optparse import OptionParser
+from sys import exit, stderr
+from dadacore.model import createModel
+from dadacore.compact import compact_model
+
+# Files storage engines keep next to data: dumbdbm's backup of index, ZODB
+# index, lock, temporary and pre-pack copy of data
+NON_DATA_SUFFIXES = ('.bak', '.index', '.lock', '.tmp', '.old')
+
+def storage_size(filename):
+    """
+    Total size of data files that storage engines create for given filename
+    (dbm, ZODB and sharded engine add their own suffixes).
+    """
+    files = set(glob(filename) + glob(filename + '.*'))
+    return sum(os.path.getsize(f) for f in files
+               if os.path.isfile(f) and not f.endswith(NON_DATA_SUFFIXES))
+
+def main():
+    parser = OptionParser(usage="%prog [options] SOURCE DEST")
+    parser.add_option("-t", "--type", default="shelve",
+                      help="model type of SOURCE and DEST [default: %default]")
+    parser.add_option("--min-contexts", type="int", default=None,
+                      help="drop transitions with words rooting less than N "
+                           "contexts")
+    parser.add_option("--drop-dead-ends", action="store_true", default=False,
+                      help="drop transitions with no path to terminator "
+                           "(implied by --min-contexts)")
+    options, args = parser.parse_args()
+    if len(args) != 2:
+        parser.error("SOURCE and DEST required")
+    source_filename, dest_filename = args
+
+    if glob(dest_filename) or glob(dest_filename + '.*'):
+        stderr.write("%s already exists\n" % dest_filename)
+        exit(1)
+
+    kwargs = {}
+    if options.type == 'shelve':
+        # Models are read and written in one pass, prefetching is useless
+        kwargs['warm_up'] = False
+    source = createModel(options.type, filename=source_filename, **kwargs)
+    dest = createModel(options.type, filename=dest_filename,
+                       order=source.order, **kwargs)
+
+    stats = compact_model(source, dest,
+                          min_contexts=options.min_contexts,
+                          drop_dead_ends=options.drop_dead_ends)
+    del source, dest
+
+    source_size = storage_size(source_filename)
+    dest_size = storage_size(dest_filename)
+    print "roots:       %d -> %d" % (stats.roots_read, stats.roots_written)
+    print "transitions: %d -> %d" % (stats.transitions_read,
+                                     stats.transitions_written)
+    print "windows dropped: %d" % stats.windows_dropped
+    print "size: %d -> %d bytes, %d reclaimed" % (
+        source_size, dest_size, source_size - dest_size)
+
+if __name__ == "__main__":
+    main()
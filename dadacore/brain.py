@@ -1,6 +1,7 @@
 import re
 from random import randint
 from dadacore.model import StartWordException, NoSuchWordException
+from dadacore.fingerprint import FingerprintSet, fingerprint
 
 class BrainIsEmptyException:
     """
@@ -15,19 +16,42 @@ class Brain:
 
     GENERATE_FROM_PHRASE_PICK_COUNT = 5
     GENERATE_FROM_PHRASE_RETRIES_COUNT = 3
+    FINGERPRINTS_EXTRA = 'line_fingerprints'
 
-    def __init__(self, model):
+    def __init__(self, model, fingerprints=True):
+        """
+        If fingerprints is set, brain keeps set of 64-bit fingerprints of
+        learned lines, stored with the model, and skips lines learned before.
+        Learning them again would not change the model anyway.
+        """
         self.model = model
+        self.skipped_lines = 0
+        self._fingerprints = None
+
+        if fingerprints:
+            self._fingerprints = FingerprintSet(model, self.FINGERPRINTS_EXTRA)
 
     def learn(self, string):
         """
         Learn string. Will throw SequenceTooShortException if string contains
-        less number of words that current model order requires.
+        less number of words that current model order requires. Returns False
+        if string was skipped as already learned, True otherwise.
         """
         assert(isinstance(string, unicode))
         words = self._string_to_words(string)
+
+        if self._fingerprints is not None:
+            line_fingerprint = fingerprint(u'\0'.join(words).encode('utf-8'))
+            if line_fingerprint in self._fingerprints:
+                self.skipped_lines += 1
+                return False
+
         self.model.learn(words)
 
+        if self._fingerprints is not None:
+            self._fingerprints.add(line_fingerprint)
+        return True
+
     def generate_random(self):
         """
         Generate random reply as string. Capitalizes first letters when detects
@@ -52,10 +76,49 @@ class Brain:
         rwords = self.model.generate_from_word(word)
         return self._words_to_string_with_caps(rwords)
 
+    def generate_random_many(self, count):
+        """
+        Generate list of count random replies, see generate_random().
+        """
+        try:
+            rwords_list = self.model.generate_random_many(count)
+        except NoSuchWordException:
+            raise BrainIsEmptyException()
+        return [ self._words_to_string_with_caps(rwords)
+                 for rwords in rwords_list ]
+
     def generate_from_phrase(self, phrase):
         """
         Generate reply to given phrase. Phrase is string with raw line of text.
         """
+        reply = self._generate_from_phrase_words(phrase)
+        if reply is not None:
+            return reply
+
+        # If all tries generating from word fails, generate random
+        return self.generate_random()
+
+    def generate_from_phrases(self, phrases):
+        """
+        Generate list of replies to given phrases, see generate_from_phrase().
+        Random replies for phrases without known words are generated in one
+        batch.
+        """
+        replies = [ self._generate_from_phrase_words(phrase)
+                    for phrase in phrases ]
+
+        missing = [ i for i, reply in enumerate(replies) if reply is None ]
+        if missing:
+            for i, reply in zip(missing,
+                                self.generate_random_many(len(missing))):
+                replies[i] = reply
+        return replies
+
+    def _generate_from_phrase_words(self, phrase):
+        """
+        Tries to generate reply from longest words of phrase. Returns None if
+        all tries fail.
+        """
         words = self._string_to_words(phrase)
         words.sort(key=lambda x: len(x), reverse=True)
         words = words[:self.GENERATE_FROM_PHRASE_PICK_COUNT]
@@ -72,13 +135,15 @@ class Brain:
             except StartWordException:
                 continue
 
-        # If all tries generating from word fails, generate random
-        return self.generate_random()
+        return None
 
     def sync(self):
         """
-        Calls sync() on this brain's model
+        Calls sync() on this brain's model, saving fingerprints of lines
+        learned since last sync first.
         """
+        if self._fingerprints is not None:
+            self._fingerprints.save()
         self.model.sync()
 
     @staticmethod
@@ -0,0 +1,225 @@
+"""
+Offline maintenance of models: copies model into fresh storage, optionally
+pruning rare words and transitions that can't lead to a terminator.
+
+Works with any model implementing iter_roots(), get_root() and store_root().
+Source model is read in streaming passes. Pruning keeps fingerprints of
+windows that reach terminator in memory (about a hundred bytes per window),
+so it needs much less memory than the model, but still grows with it; plain
+copy keeps nothing.
+
+Pruning works on windows -- sequences of order+1 words the model was taught
+(None at line start/end). Each window is stored twice: as forward entry
+(root w0, middle w1..wn-1, successor wn) and as backward entry (root wn, same
+middle, successor w0). Window is dropped from both directions at once, so
+generation seeded in one direction never misses entry in another.
+"""
+
+from dadacore.fingerprint import fingerprint
+
+class CompactStats:
+    """
+    Counters collected by compact_model()
+    """
+    def __init__(self):
+        self.roots_read = 0
+        self.roots_written = 0
+        self.transitions_read = 0
+        self.transitions_written = 0
+        self.windows_dropped = 0
+
+def successors_list(rightmost_variants):
+    """
+    Returns successors stored in variants dict as list (single successor or
+    None are stored unwrapped).
+    """
+    if isinstance(rightmost_variants, list):
+        return rightmost_variants
+    return [rightmost_variants]
+
+def successors_value(successors):
+    """
+    Reverse of successors_list().
+    """
+    if len(successors) == 1:
+        return successors[0]
+    return list(successors)
+
+def _window(word, direction, middle, rightmost):
+    if direction == 'f':
+        return (word,) + middle + (rightmost,)
+    else:
+        return (rightmost,) + middle + (word,)
+
+def _window_fingerprint(window):
+    return fingerprint(u'\0'.join(word or u'' for word in window)
+                       .encode('utf-8'))
+
+class _Pruner:
+    """
+    Finds windows to keep: ones without rare words, from which terminator
+    can be reached through such windows both forward and backward.
+    Generation walking kept windows always has a way to finish line.
+
+    Only windows stored in both directions count: learning replaces
+    terminator successor when other successor is added to it, so some
+    windows are left with one entry.
+    """
+    def __init__(self, model, min_contexts):
+        self.model = model
+        self.min_contexts = min_contexts
+        self._contexts_cache = {}
+        self._reaches = {'f': set(), 'b': set()}
+
+    def _variants(self, word, direction):
+        try:
+            return self.model.get_root(word, direction)
+        except KeyError:
+            return {}
+
+    def _contexts(self, word):
+        """
+        Number of contexts rooted at word in both directions. Used as word
+        frequency, as model does not count occurrences.
+        """
+        if word not in self._contexts_cache:
+            self._contexts_cache[word] = \
+                len(self._variants(word, 'f')) + len(self._variants(word, 'b'))
+        return self._contexts_cache[word]
+
+    def _is_rare(self, window):
+        if not self.min_contexts:
+            return False
+        for word in window:
+            if word is not None and self._contexts(word) < self.min_contexts:
+                return True
+        return False
+
+    def _is_stored(self, window):
+        middle = window[1:-1]
+        for word, direction, rightmost in ((window[0], 'f', window[-1]),
+                                           (window[-1], 'b', window[0])):
+            variants = self._variants(word, direction)
+            if middle not in variants or \
+                    rightmost not in successors_list(variants[middle]):
+                return False
+        return True
+
+    def _is_usable(self, window):
+        return self._is_stored(window) and not self._is_rare(window)
+
+    def _predecessors(self, window, direction):
+        """
+        Windows that continue into window in given direction, i.e. windows
+        preceding it for 'f' and following it for 'b'.
+        """
+        if direction == 'f':
+            middle = window[:-2]
+            variants = self._variants(window[-2], 'b')
+        else:
+            middle = window[2:]
+            variants = self._variants(window[1], 'f')
+        if middle not in variants:
+            return []
+        if direction == 'f':
+            return [ (rightmost,) + window[:-1]
+                     for rightmost in successors_list(variants[middle]) ]
+        else:
+            return [ window[1:] + (rightmost,)
+                     for rightmost in successors_list(variants[middle]) ]
+
+    def _propagate(self, seeds, direction):
+        """
+        Marks all windows, from which some of (already marked) seeds can be
+        reached through usable windows in given direction.
+        """
+        reaches = self._reaches[direction]
+        queue = seeds
+        while queue:
+            window = queue.pop()
+            for previous in self._predecessors(window, direction):
+                key = _window_fingerprint(previous)
+                if key not in reaches and self._is_usable(previous):
+                    reaches.add(key)
+                    queue.append(previous)
+
+    def run(self):
+        """
+        Streams through model once collecting windows that end or start
+        with terminator, then walks from them through model entries.
+        """
+        seeds = {'f': [], 'b': []}
+        for word, direction, variants in self.model.iter_roots():
+            if direction != 'f':
+                continue
+            for middle, rightmost_variants in variants.iteritems():
+                for rightmost in successors_list(rightmost_variants):
+                    window = _window(word, direction, middle, rightmost)
+                    if not self._is_usable(window):
+                        continue
+                    if window[-1] is None:
+                        seeds['f'].append(window)
+                    if window[0] is None:
+                        seeds['b'].append(window)
+
+        for direction in ('f', 'b'):
+            self._reaches[direction].update(
+                _window_fingerprint(window) for window in seeds[direction])
+            self._propagate(seeds[direction], direction)
+
+    def is_kept(self, window):
+        key = _window_fingerprint(window)
+        return key in self._reaches['f'] and key in self._reaches['b']
+
+def compact_model(source, dest, min_contexts=None, drop_dead_ends=False,
+                  sync_every=1000):
+    """
+    Copies all root entries from source model to dest model. Dest should be
+    created empty with the same order as source.
+
+    If min_contexts is set, drops every transition involving word that roots
+    less than min_contexts contexts. If drop_dead_ends or min_contexts is
+    set, also drops every transition that has no path to terminator in
+    either direction. Roots and middles left without successors are not
+    written.
+
+    Dest is synced every sync_every written roots, and packed at the end.
+    Returns CompactStats.
+    """
+    assert(source.order == dest.order)
+    stats = CompactStats()
+
+    # Dropping rare words leaves windows whose only continuations were
+    # dropped, so dead ends are always pruned along with them
+    pruner = None
+    if drop_dead_ends or min_contexts:
+        pruner = _Pruner(source, min_contexts)
+        pruner.run()
+
+    for word, direction, variants in source.iter_roots():
+        stats.roots_read += 1
+        new_variants = {}
+        for middle, rightmost_variants in variants.iteritems():
+            successors = successors_list(rightmost_variants)
+            stats.transitions_read += len(successors)
+            if pruner is None:
+                kept = successors
+            else:
+                kept = [ rightmost for rightmost in successors
+                         if pruner.is_kept(
+                             _window(word, direction, middle, rightmost)) ]
+            if kept:
+                new_variants[middle] = successors_value(kept)
+                stats.transitions_written += len(kept)
+            if direction == 'f':
+                stats.windows_dropped += len(successors) - len(kept)
+
+        if new_variants:
+            dest.store_root(word, direction, new_variants)
+            stats.roots_written += 1
+            if stats.roots_written % sync_every == 0:
+                dest.sync()
+
+    dest.sync()
+    dest.pack()
+    return stats
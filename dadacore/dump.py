@@ -0,0 +1,101 @@
+"""
+Engine-agnostic dump format, for moving models between storage engines.
+
+Dump is text file with one JSON document per line. First line is header:
+
+  {"format": "dadacore-dump", "version": 1, "order": 4}
+
+Every following line is one root entry of model:
+
+  [word, direction, [[middle, successors], ...]]
+
+where word is null for terminator, middle is list of words in natural
+order and successors is list of words (null for terminator). Records are
+independent, so dump can be written and read in streaming fashion, and split
+into chunks at any line.
+"""
+
+from itertools import islice
+try:
+    import json
+except ImportError:
+    import simplejson as json
+from dadacore.compact import successors_list, successors_value
+
+FORMAT = 'dadacore-dump'
+VERSION = 1
+
+class DumpFormatException(Exception):
+    pass
+
+def dump_model(model, fileobj):
+    """
+    Writes all root entries of model to file object. Returns number of
+    entries written.
+    """
+    fileobj.write(json.dumps({
+        'format': FORMAT,
+        'version': VERSION,
+        'order': model.order,
+    }) + "\n")
+
+    count = 0
+    for word, direction, variants in model.iter_roots():
+        fileobj.write(json.dumps(
+            [word, direction,
+             [ [middle, successors_list(rightmost_variants)]
+               for middle, rightmost_variants in variants.iteritems() ]]
+        ) + "\n")
+        count += 1
+    return count
+
+def read_header(fileobj):
+    """
+    Reads and checks header line of dump. Returns header dict.
+    """
+    try:
+        header = json.loads(fileobj.readline())
+    except ValueError:
+        raise DumpFormatException("Header is not valid JSON")
+    if not isinstance(header, dict) or header.get('format') != FORMAT:
+        raise DumpFormatException("Not a %s file" % FORMAT)
+    if header.get('version') != VERSION:
+        raise DumpFormatException("Unsupported version: %s" %
+                                  header.get('version'))
+    return header
+
+def decode_record(line):
+    """
+    Decodes dump line. Returns tuple (word, direction, variants) in format
+    of AbstractModel.iter_roots().
+    """
+    word, direction, items = json.loads(line)
+    if direction not in ('f', 'b'):
+        raise DumpFormatException("Bad direction: %r" % direction)
+    variants = {}
+    for middle, successors in items:
+        variants[tuple(middle)] = successors_value(successors)
+    return (word, direction, variants)
+
+def _chunks(fileobj, chunk_size):
+    while 1:
+        lines = list(islice(fileobj, chunk_size))
+        if not lines:
+            break
+        yield lines
+
+def load_model(fileobj, model, chunk_size=1000):
+    """
+    Loads dump (header must be already read with read_header()) into empty
+    model. Returns number of entries loaded.
+
+    File is read in chunks of chunk_size lines, each chunk is stored with
+    one store_roots() call (so sharded model writes it on all shards in
+    parallel) and followed by sync().
+    """
+    count = 0
+    for lines in _chunks(fileobj, chunk_size):
+        model.store_roots([ decode_record(line) for line in lines ])
+        model.sync()
+        count += len(lines)
+    return count
@@ -39,6 +39,22 @@ class KeyValueModel(model.AbstractModel):
         if word is None: word = ''
         return (">%s" if direction == 'f' else "<%s") % word.encode('utf-8')
 
+    @staticmethod
+    def _parse_root_key(key):
+        """
+        Reverse of _root_key(). Returns tuple (word, direction) or None if key
+        is not a root key (such as '.config').
+        """
+        if key.startswith('>'):
+            direction = 'f'
+        elif key.startswith('<'):
+            direction = 'b'
+        else:
+            return None
+        word = key[1:].decode('utf-8')
+        if word == '': word = None
+        return (word, direction)
+
     def learn(self, words):
         """
         Learn sequence of words, by creating transitions in Markov model.
@@ -48,26 +64,30 @@ class KeyValueModel(model.AbstractModel):
         if len(words) < self.order+1:
             raise model.SequenceTooShortException(words)
 
+        transitions = []
         window = (None,) + tuple(words[:ord])
         for word in words[ord:]:
-            self._learn_window(window)
+            self._learn_window(window, transitions)
             window = window[1:] + (word,)
-        self._learn_window(window)
-        self._learn_window(window[1:] + (None,))
+        self._learn_window(window, transitions)
+        self._learn_window(window[1:] + (None,), transitions)
+
+        self._add_transitions(transitions)
 
-    def _learn_window(self, words):
+    def _learn_window(self, words, transitions):
         """
         Learn sequence of words. Words must be tuple with count equals to
         model's order + 1.
         """
         for direction in ('f', 'b'):
-            self._learn_window_dir(words, direction)
+            self._learn_window_dir(words, direction, transitions)
 
-    def _learn_window_dir(self, words, direction):
+    def _learn_window_dir(self, words, direction, transitions):
         """
         Learn sequence of words in one direction.
         Words must be tuple with count equals to model's order + 1. Direction
-        is string and can be 'f' (forward) or 'b' (back).
+        is string and can be 'f' (forward) or 'b' (back). Resulting transition
+        (root key, middle, rightmost) is appended to transitions list.
         """
         ord = self.order
         assert(len(words) == ord+1)
@@ -75,33 +95,29 @@ class KeyValueModel(model.AbstractModel):
 
         if direction == 'f':
             root_key = self._root_key(words[0], direction)
-        else:
-            root_key = self._root_key(words[-1], direction)
-
-        if not self.db.has_key(root_key):
-            self.db[root_key] = {}
-        toplevel = self.db[root_key]
-
-        key = words[1:-1]
-        if direction == 'f':
             rightmost = words[-1]
         else:
+            root_key = self._root_key(words[-1], direction)
             rightmost = words[0]
-        if not toplevel.has_key(key):
-            toplevel[key] = rightmost
-        else:
-            if isinstance(toplevel[key], unicode):
-                if toplevel[key] != rightmost:
-                    toplevel[key] = [ toplevel[key], rightmost ]
-            elif isinstance(toplevel[key], list):
-                if rightmost not in toplevel[key]:
-                    toplevel[key].append(rightmost)
-            else:
-                assert(toplevel[key] is None)
 
-                toplevel[key] = rightmost
+        transitions.append((root_key, words[1:-1], rightmost))
 
-        self.db[root_key] = toplevel
+    def _add_transitions(self, transitions):
+        """
+        Stores transitions collected by _learn_window_dir().
+        """
+        add_transitions(self.db, transitions)
+
+    def _get_roots(self, root_keys):
+        """
+        Fetches several root entries at once. Returns dict mapping root keys
+        to variants, missing keys are omitted.
+        """
+        roots = {}
+        for root_key in root_keys:
+            if self.db.has_key(root_key):
+                roots[root_key] = self.db[root_key]
+        return roots
 
     def generate_random(self):
         """
@@ -113,6 +129,41 @@ class KeyValueModel(model.AbstractModel):
         expanded_f = self._expand_window_f(window)
         return list(window) + expanded_f
 
+    def generate_random_many(self, count):
+        """
+        Generate count random sequences, like generate_random(). Sequences
+        are expanded in lockstep, so root entries needed for each step are
+        fetched with one _get_roots() call.
+        """
+        if count <= 0:
+            return []
+
+        root_key_start = self._root_key(None, 'f')
+        start_variants = self._get_roots([root_key_start]).get(root_key_start)
+        if start_variants is None:
+            raise model.NoSuchWordException(None)
+
+        walks = []
+        for i in range(count):
+            window = self._seed_window_from(None, 'f', start_variants)
+            walks.append((window, list(window)))
+        results = [ result for window, result in walks ]
+
+        while walks:
+            roots = self._get_roots(set(self._root_key(window[0], 'f')
+                                        for window, result in walks))
+            next_walks = []
+            for window, result in walks:
+                rightmost = self._next_f(
+                    window, roots[self._root_key(window[0], 'f')])
+                if rightmost is None:
+                    continue
+                result.append(rightmost)
+                next_walks.append((window[1:] + (rightmost,), result))
+            walks = next_walks
+
+        return results
+
     def generate_from_word(self, word):
         """
         Generate sequence containing specified word.
@@ -124,6 +175,26 @@ class KeyValueModel(model.AbstractModel):
 
         return expanded_b + list(window) + expanded_f
 
+    @staticmethod
+    def _choose_rightmost(rightmost_variants):
+        """
+        Picks random successor from variants. Returns None if terminator is
+        picked.
+        """
+        if isinstance(rightmost_variants, list):
+            return random.choice(rightmost_variants)
+        elif isinstance(rightmost_variants, unicode):
+            return rightmost_variants
+        else:
+            assert(rightmost_variants is None)
+            return None
+
+    def _next_f(self, window, middle_variants):
+        return self._choose_rightmost(middle_variants[window[1:]])
+
+    def _next_b(self, window, middle_variants):
+        return self._choose_rightmost(middle_variants[window[:-1]])
+
     def _expand_window_f(self, window):
         assert(isinstance(window, tuple))
         assert(len(window) == self.order)
@@ -132,16 +203,8 @@ class KeyValueModel(model.AbstractModel):
 
         while 1:
             middle_variants = self.db[self._root_key(window[0], 'f')]
-            rightmost_variants = middle_variants[window[1:]]
-
-            if isinstance(rightmost_variants, list):
-                rightmost = random.choice(rightmost_variants)
-                if rightmost is None:
-                    break
-            elif isinstance(rightmost_variants, unicode):
-                rightmost = rightmost_variants
-            else:
-                assert(rightmost_variants is None)
+            rightmost = self._next_f(window, middle_variants)
+            if rightmost is None:
                 break
 
             window = window + (rightmost,)
@@ -159,16 +222,8 @@ class KeyValueModel(model.AbstractModel):
 
         while 1:
             middle_variants = self.db[self._root_key(window[-1], 'b')]
-            rightmost_variants = middle_variants[window[:-1]]
-
-            if isinstance(rightmost_variants, list):
-                rightmost = random.choice(rightmost_variants)
-                if rightmost is None:
-                    break
-            elif isinstance(rightmost_variants, unicode):
-                rightmost = rightmost_variants
-            else:
-                assert(rightmost_variants is None)
+            rightmost = self._next_b(window, middle_variants)
+            if rightmost is None:
                 break
 
             window = (rightmost,) + window
@@ -192,6 +247,10 @@ class KeyValueModel(model.AbstractModel):
         except KeyError:
             raise model.NoSuchWordException(start_word)
 
+        return self._seed_window_from(start_word, direction, middle_variants)
+
+    @staticmethod
+    def _seed_window_from(start_word, direction, middle_variants):
         middle = random.choice(middle_variants.keys())
         assert(isinstance(middle, tuple))
 
@@ -212,5 +271,62 @@ class KeyValueModel(model.AbstractModel):
             assert(direction == 'b')
             return middle + (start_word,)
 
+    def iter_roots(self):
+        for key, variants in self.db.iteritems():
+            parsed = self._parse_root_key(key)
+            if parsed is not None:
+                yield parsed + (variants,)
+
+    def get_root(self, word, direction):
+        return self.db[self._root_key(word, direction)]
+
+    def store_root(self, word, direction, variants):
+        self.db[self._root_key(word, direction)] = variants
+
+    def get_extra(self, name):
+        key = '.%s' % name
+        if not self.db.has_key(key):
+            return None
+        return self.db[key]
+
+    def set_extra(self, name, value):
+        self.db['.%s' % name] = value
+
     def sync(self):
         self.db.sync()
+
+def add_successor(toplevel, key, rightmost):
+    """
+    Adds rightmost to successors of middle key in root entry dict toplevel.
+    Successors have set semantics: adding known one changes nothing.
+    """
+    if not toplevel.has_key(key):
+        toplevel[key] = rightmost
+    else:
+        if isinstance(toplevel[key], unicode):
+            if toplevel[key] != rightmost:
+                toplevel[key] = [ toplevel[key], rightmost ]
+        elif isinstance(toplevel[key], list):
+            if rightmost not in toplevel[key]:
+                toplevel[key].append(rightmost)
+        else:
+            assert(toplevel[key] is None)
+
+            toplevel[key] = rightmost
+
+def add_transitions(proxy, transitions):
+    """
+    Adds list of transitions (root key, middle, rightmost) to proxy. Each
+    root entry is fetched and stored once.
+    """
+    roots = {}
+    for root_key, key, rightmost in transitions:
+        if root_key not in roots:
+            if proxy.has_key(root_key):
+                roots[root_key] = proxy[root_key]
+            else:
+                roots[root_key] = {}
+        add_successor(roots[root_key], key, rightmost)
+
+    for root_key, toplevel in roots.iteritems():
+        proxy[root_key] = toplevel
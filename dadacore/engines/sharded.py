@@ -0,0 +1,336 @@
+"""
+Sharded engine, based on generic key-value store. Root keys are spread over
+several shards by hash, each shard keeps its part of model in own shelve
+file.
+
+Shard can be:
+ * LocalShard -- proxy in the same process, mostly for tests;
+ * ConnectionShard -- proxy served by another process (see spawn_shard())
+   or another host (see connect_shard() and serve_shard_forever()) over
+   multiprocessing connection.
+
+Requests are sent to all shards involved before waiting for any reply, so
+shards process batches in parallel.
+"""
+
+from atexit import register as atexit_register
+from multiprocessing import Pipe, Process
+from multiprocessing.connection import Client, Listener
+from sys import exc_info
+from zlib import crc32
+from keyvalue import KeyValueModel, add_transitions
+from shelvedb import ShelveProxy
+from weakref import WeakSet
+
+def _dispatch(proxy, op, args):
+    """
+    Performs shard operation on proxy. Returns operation result.
+    """
+    if op == 'get_many':
+        keys, = args
+        return dict((key, proxy[key]) for key in keys if proxy.has_key(key))
+    elif op == 'set_many':
+        items, = args
+        for key, value in items.iteritems():
+            proxy[key] = value
+    elif op == 'add_transitions':
+        transitions, = args
+        add_transitions(proxy, transitions)
+    elif op == 'has_key':
+        key, = args
+        return proxy.has_key(key)
+    elif op == 'keys':
+        return proxy.keys()
+    elif op == 'sync':
+        proxy.sync()
+    else:
+        raise ValueError("No such shard operation: %s" % op)
+
+class LocalShard:
+    """
+    Shard that calls proxy in current process.
+    """
+    def __init__(self, proxy):
+        self.proxy = proxy
+        self._replies = []
+
+    def send(self, op, *args):
+        try:
+            self._replies.append((True, _dispatch(self.proxy, op, args)))
+        except Exception, e:
+            self._replies.append((False, e))
+
+    def recv(self):
+        ok, result = self._replies.pop(0)
+        if not ok:
+            raise result
+        return result
+
+    def call(self, op, *args):
+        self.send(op, *args)
+        return self.recv()
+
+    def close(self):
+        self.proxy.sync()
+
+class ConnectionShard:
+    """
+    Shard served by serve_shard() on other end of connection.
+    """
+    def __init__(self, conn, process=None):
+        self.conn = conn
+        self.process = process
+
+    def send(self, op, *args):
+        self.conn.send((op, args))
+
+    def recv(self):
+        ok, result = self.conn.recv()
+        if not ok:
+            raise result
+        return result
+
+    def call(self, op, *args):
+        self.send(op, *args)
+        return self.recv()
+
+    def close(self):
+        self.conn.send(('close', ()))
+        self.conn.close()
+        if self.process is not None:
+            self.process.join()
+
+def serve_shard(conn, proxy):
+    """
+    Serves shard requests from connection until it is closed.
+    """
+    while 1:
+        try:
+            op, args = conn.recv()
+        except EOFError:
+            break
+        if op == 'close':
+            break
+
+        try:
+            conn.send((True, _dispatch(proxy, op, args)))
+        except Exception, e:
+            conn.send((False, e))
+    proxy.sync()
+
+def _run_shard(conn, filename):
+    serve_shard(conn, ShelveProxy(filename))
+
+def spawn_shard(filename):
+    """
+    Starts shard process storing data in shelve file. Returns
+    ConnectionShard connected to it through pipe.
+    """
+    conn, child_conn = Pipe()
+    process = Process(target=_run_shard, args=(child_conn, filename))
+    process.daemon = True
+    process.start()
+    return ConnectionShard(conn, process)
+
+def serve_shard_forever(address, filename, authkey):
+    """
+    Listens on address and serves shard stored in shelve file to connected
+    clients, one at a time. Authkey is required: requests are unpickled, so
+    unauthenticated client could run arbitrary code.
+    """
+    if not authkey:
+        raise ValueError("authkey is required to serve shard")
+    proxy = ShelveProxy(filename)
+    listener = Listener(address, authkey=authkey)
+    while 1:
+        conn = listener.accept()
+        try:
+            serve_shard(conn, proxy)
+        finally:
+            conn.close()
+
+def connect_shard(address, authkey):
+    """
+    Returns ConnectionShard connected to shard served by
+    serve_shard_forever() with the same authkey.
+    """
+    if not authkey:
+        raise ValueError("authkey is required to connect to shard")
+    return ConnectionShard(Client(address, authkey=authkey))
+
+class ShardedProxy:
+    """
+    Proxy that routes keys to shards by hash.
+    """
+    _ITERITEMS_CHUNK = 100
+
+    def __init__(self, shards):
+        assert(shards)
+        self.shards = shards
+
+    def _shard_index(self, key):
+        return (crc32(key) & 0xffffffff) % len(self.shards)
+
+    def _group(self, keys):
+        """
+        Groups keys by shard. Returns dict mapping shard index to list of
+        keys.
+        """
+        groups = {}
+        for key in keys:
+            groups.setdefault(self._shard_index(key), []).append(key)
+        return groups
+
+    def _call_all(self, requests):
+        """
+        Sends requests (shard index, op, args) to shards, then collects
+        replies in the same order. If some shards fail, replies of all
+        shards are still read, so none is left to be mistaken for reply to
+        next request; then first error is raised.
+        """
+        for index, op, args in requests:
+            self.shards[index].send(op, *args)
+
+        replies = []
+        error = None
+        for index, op, args in requests:
+            try:
+                replies.append(self.shards[index].recv())
+            except Exception:
+                if error is None:
+                    error = exc_info()
+                replies.append(None)
+        if error is not None:
+            raise error[0], error[1], error[2]
+        return replies
+
+    def get_many(self, keys):
+        """
+        Fetches several keys at once. Returns dict, missing keys are omitted.
+        """
+        result = {}
+        for reply in self._call_all([
+                (index, 'get_many', (shard_keys,))
+                for index, shard_keys in self._group(keys).iteritems() ]):
+            result.update(reply)
+        return result
+
+    def set_many(self, items):
+        requests = []
+        for index, shard_keys in self._group(items.keys()).iteritems():
+            shard_items = dict((key, items[key]) for key in shard_keys)
+            requests.append((index, 'set_many', (shard_items,)))
+        self._call_all(requests)
+
+    def add_transitions(self, transitions):
+        """
+        Sends transitions (root key, middle, rightmost) to shards owning root
+        keys, so they are merged into root entries on shard side.
+        """
+        groups = {}
+        for transition in transitions:
+            groups.setdefault(self._shard_index(transition[0]), []) \
+                .append(transition)
+        self._call_all([ (index, 'add_transitions', (shard_transitions,))
+                         for index, shard_transitions in groups.iteritems() ])
+
+    def __getitem__(self, key):
+        values = self.get_many([key])
+        if key not in values:
+            raise KeyError(key)
+        return values[key]
+
+    def __setitem__(self, key, value):
+        self.set_many({key: value})
+
+    def has_key(self, key):
+        return self.shards[self._shard_index(key)].call('has_key', key)
+
+    def keys(self):
+        keys = []
+        for shard_keys in self._call_all([
+                (index, 'keys', ()) for index in range(len(self.shards)) ]):
+            keys.extend(shard_keys)
+        return keys
+
+    def iteritems(self):
+        for shard in self.shards:
+            keys = shard.call('keys')
+            for i in range(0, len(keys), self._ITERITEMS_CHUNK):
+                values = shard.call('get_many',
+                                    keys[i:i+self._ITERITEMS_CHUNK])
+                for key, value in values.iteritems():
+                    yield key, value
+
+    def sync(self):
+        self._call_all([ (index, 'sync', ())
+                         for index in range(len(self.shards)) ])
+
+    def close(self):
+        for shard in self.shards:
+            shard.close()
+        self.shards = []
+
+class ShardedModel(KeyValueModel):
+    """
+    Key-value model spread over several shards. Learned transitions and
+    lookups for lockstep generation are sent to shards in batches.
+    """
+
+    DEFAULT_FILENAME = "markovdb"
+    DEFAULT_SHARDS = 4
+
+    def __init__(self, filename=None, order=None, shards=None,
+                 addresses=None, authkey=None):
+        """
+        Shards can be list of shard objects or number of local shard
+        processes to spawn, each storing data in file named filename.N. If
+        addresses list is given, connects to shard servers instead, using
+        authkey they were started with.
+        """
+        if not filename: filename = self.DEFAULT_FILENAME
+
+        if addresses:
+            shards = [ connect_shard(address, authkey)
+                       for address in addresses ]
+        elif not isinstance(shards, list):
+            if not shards: shards = self.DEFAULT_SHARDS
+            shards = [ spawn_shard("%s.%d" % (filename, i))
+                       for i in range(shards) ]
+
+        proxy = ShardedProxy(shards)
+        KeyValueModel.__init__(self, proxy=proxy, order=order)
+        _open_models.add(self)
+
+    def _add_transitions(self, transitions):
+        self.db.add_transitions(transitions)
+
+    def _get_roots(self, root_keys):
+        return self.db.get_many(root_keys)
+
+    def store_roots(self, entries):
+        self.db.set_many(dict((self._root_key(word, direction), variants)
+                              for word, direction, variants in entries))
+
+    def close(self):
+        """
+        Syncs and closes all shards.
+        """
+        # Model may be not fully constructed if connecting to shards failed
+        if hasattr(self, 'db') and self.db.shards:
+            self.db.sync()
+            self.db.close()
+        _open_models.discard(self)
+
+    def __del__(self):
+        self.close()
+
+# Shard processes are terminated by multiprocessing at exit, before models
+# are garbage collected, so models still open are closed before that happens
+_open_models = WeakSet()
+
+def _close_open_models():
+    for model in list(_open_models):
+        model.close()
+
+atexit_register(_close_open_models)
@@ -1,4 +1,10 @@
+from __future__ import with_statement
+try:
+    from cPickle import dumps
+except ImportError:
+    from pickle import dumps
 from shelve import open as shelve_open
+from threading import RLock, Thread
 from time import time
 from keyvalue import KeyValueModel
 
@@ -26,8 +32,14 @@ class ShelveProxyCachedValue:
 class ShelveProxy:
     """
     Proxy for Shelve hash-like object. Caches items.
+
+    On sync() the hottest cached keys are remembered in the shelve itself
+    (under HOT_KEYS_KEY), so they can be prefetched with warm_up() after
+    restart instead of missing to disk one by one.
     """
 
+    HOT_KEYS_KEY = '.hotkeys'
+
     _CACHE_KEYS = 50
     _CACHE_KEYS_CLEAN_THRESHOLD = 60
     _CACHE_ADD_SECONDS_FOR_EACH_HIT = 30
@@ -38,6 +50,10 @@ class ShelveProxy:
         """
         self._s = shelve_open(*pargs, **kwargs)
         self._cache = {}
+        # Guards _s and _cache when warm_up() runs in background thread
+        self._lock = RLock()
+        # Hot keys as last written to shelve, to skip rewriting same list
+        self._saved_hot_keys = self._s.get(self.HOT_KEYS_KEY)
 
     def _cleanupIfThreshold(self):
         if len(self._cache) >= self._CACHE_KEYS_CLEAN_THRESHOLD:
@@ -62,24 +78,111 @@ class ShelveProxy:
                 self._cache[item[0]].dirty = False
 
     def __getitem__(self, key):
-        if key in self._cache:
-            value = self._cache[key].get()
-        else:
-            value = self._s[key]
-            self._cache[key] = ShelveProxyCachedValue(value)
+        with self._lock:
+            if key in self._cache:
+                value = self._cache[key].get()
+            else:
+                value = self._s[key]
+                self._cache[key] = ShelveProxyCachedValue(value)
 
-        self._cleanupIfThreshold()
-        return value
+            self._cleanupIfThreshold()
+            return value
 
     def __setitem__(self, key, value):
-        self._cache[key] = ShelveProxyCachedValue(value, dirty=True)
-        self._cleanupIfThreshold()
+        with self._lock:
+            self._cache[key] = ShelveProxyCachedValue(value, dirty=True)
+            self._cleanupIfThreshold()
 
     def has_key(self, key):
-        return self._cache.has_key(key) or self._s.has_key(key)
+        with self._lock:
+            return self._cache.has_key(key) or self._s.has_key(key)
+
+    def hot_keys(self):
+        """
+        Returns list of cached keys worth prefetching after restart, hottest
+        first. Keys are ordered by hit count; of equally hit keys ones with
+        smaller pickled values go first, as they are cheaper to keep in cache.
+        """
+        with self._lock:
+            items = [ (-valueobj.hits, len(dumps(valueobj.value)), key)
+                      for key, valueobj in self._cache.items()
+                      if not key.startswith('.') ]
+        items.sort()
+        return [ key for hits, size, key in items[:self._CACHE_KEYS] ]
+
+    def warm_up(self, keys=None):
+        """
+        Loads keys into cache without counting it as hits. If keys is not
+        given, loads hot keys saved by previous sync(). Keys already in cache
+        or missing in shelve are skipped.
+
+        All keys are read in one batch under one lock acquisition; there are
+        at most as many of them as cache holds.
+        """
+        if keys is None:
+            keys = self._saved_hot_keys or []
+
+        with self._lock:
+            self._cache.update(
+                (key, ShelveProxyCachedValue(self._s[key]))
+                for key in keys[:self._CACHE_KEYS]
+                if key not in self._cache and self._s.has_key(key))
+
+    def warm_up_background(self, keys=None):
+        """
+        Runs warm_up() in daemon thread. Returns started thread.
+        """
+        thread = Thread(target=self.warm_up, args=(keys,))
+        thread.setDaemon(True)
+        thread.start()
+        return thread
+
+    def keys(self):
+        """
+        Returns list of keys in shelve. Dirty cached values are written first.
+        """
+        self.sync()
+        with self._lock:
+            return self._s.keys()
+
+    def cache_info(self):
+        """
+        Returns dict with numbers of cached, dirty and all stored keys and
+        percentage of stored keys resident in cache. Service keys (starting
+        with '.') are not counted.
+        """
+        with self._lock:
+            items = [ item for item in self._cache.items()
+                      if not item[0].startswith('.') ]
+            stored = set(key for key in self._s.keys()
+                         if not key.startswith('.'))
+        stored.update(key for key, valueobj in items)
+        return {
+            'keys': len(items),
+            'dirty': len([ key for key, valueobj in items if valueobj.dirty ]),
+            'capacity': self._CACHE_KEYS,
+            'stored': len(stored),
+            'resident': 100.0 * len(items) / len(stored) if stored else 0.0,
+        }
+
+    def iteritems(self):
+        """
+        Iterates over (key, value) pairs in shelve, bypassing cache, so hit
+        counts are not affected. Dirty cached values are written first.
+        """
+        self.sync()
+        for key in self._s.keys():
+            with self._lock:
+                value = self._s[key]
+            yield key, value
 
     def sync(self):
-        self._writeDirty(self._cache.items())
+        with self._lock:
+            self._writeDirty(self._cache.items())
+            hot_keys = self.hot_keys()
+            if hot_keys and hot_keys != self._saved_hot_keys:
+                self._s[self.HOT_KEYS_KEY] = hot_keys
+                self._saved_hot_keys = hot_keys
 
     def __del__(self):
         self.sync()
@@ -88,8 +191,22 @@ class ShelveModel(KeyValueModel):
 
     DEFAULT_FILENAME = "markovdb"
 
-    def __init__(self, filename=None, order=None):
+    def __init__(self, filename=None, order=None, warm_up=True,
+                 warm_up_background=False):
+        """
+        Opens shelve model. If warm_up is set, keys that were hot before last
+        sync are prefetched into cache, in background thread if
+        warm_up_background is set.
+        """
         if not filename: filename = self.DEFAULT_FILENAME
 
         proxy = ShelveProxy(filename)
         KeyValueModel.__init__(self, proxy=proxy, order=order)
+
+        if warm_up_background:
+            proxy.warm_up_background()
+        elif warm_up:
+            proxy.warm_up()
+
+    def cache_info(self):
+        return self.db.cache_info()
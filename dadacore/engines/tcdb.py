@@ -25,6 +25,16 @@ class TcProxy():
     def has_key(self, key):
         return self.hdb.has_key(key)
 
+    def keys(self):
+        return list(self.hdb.iterkeys())
+
+    def iteritems(self):
+        for key in self.hdb.iterkeys():
+            yield key, loads(self.hdb[key])
+
+    def sync(self):
+        self.hdb.sync()
+
 class TcdbModel(KeyValueModel):
 
     DEFAULT_FILENAME = "markovdb.tch"
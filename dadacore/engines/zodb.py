@@ -17,14 +17,17 @@ class ZodbModel(dadacore.model.AbstractModel):
     """
     DEFAULT_FILENAME = "markovdb.fs"
     DEFAULT_ORDER = 4
+    _ITER_CACHE_GC_EVERY = 1000
 
     def __init__(self, filename=None, order=None):
         if not filename: filename = self.DEFAULT_FILENAME
         storage = FileStorage.FileStorage(filename)
         self.db = DB(storage)
 
-        conn = self.db.open()
-        root = conn.root()
+        # One connection for model's lifetime, so its object cache is reused
+        # between calls
+        self.conn = self.db.open()
+        root = self.conn.root()
 
         if 'config' in root:
             self.order = root['config']['order']
@@ -49,8 +52,7 @@ class ZodbModel(dadacore.model.AbstractModel):
         Words is list of strings.
         """
 
-        conn = self.db.open()
-        root = conn.root()
+        root = self.conn.root()
 
         if __debug__:
             for word in words:
@@ -118,8 +120,7 @@ class ZodbModel(dadacore.model.AbstractModel):
         Returns list of words, each word is string.
         """
 
-        conn = self.db.open()
-        root = conn.root()
+        root = self.conn.root()
 
         middle_variants = root['f'][None]
         middle = random.choice(middle_variants.keys())
@@ -153,3 +154,57 @@ class ZodbModel(dadacore.model.AbstractModel):
             result.append(rightmost)
 
         return result
+
+    def iter_roots(self):
+        root = self.conn.root()
+
+        count = 0
+        for direction in ('f', 'b'):
+            for word, variants in root[direction].iteritems():
+                yield (word, direction,
+                       self._variants_from_storage(variants, direction))
+                count += 1
+                if count % self._ITER_CACHE_GC_EVERY == 0:
+                    # Keep cache within its size while streaming
+                    self.conn.cacheGC()
+
+    def get_root(self, word, direction):
+        root = self.conn.root()
+
+        return self._variants_from_storage(root[direction][word], direction)
+
+    def store_root(self, word, direction, variants):
+        root = self.conn.root()
+
+        if direction == 'b':
+            variants = dict((tuple(reversed(middle)), rightmost)
+                            for middle, rightmost in variants.iteritems())
+        root[direction][word] = variants
+
+    @staticmethod
+    def _variants_from_storage(variants, direction):
+        """
+        Backward entries are stored with reversed middles, turn them to
+        natural word order.
+        """
+        if direction == 'f':
+            return dict(variants)
+        return dict((tuple(reversed(middle)), rightmost)
+                    for middle, rightmost in variants.iteritems())
+
+    def get_extra(self, name):
+        root = self.conn.root()
+
+        return root.get('.%s' % name)
+
+    def set_extra(self, name, value):
+        root = self.conn.root()
+
+        root['.%s' % name] = value
+
+    def sync(self):
+        transaction.commit()
+
+    def pack(self):
+        transaction.commit()
+        self.db.pack()
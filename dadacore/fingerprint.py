@@ -0,0 +1,71 @@
+"""
+Set of fingerprints of learned lines, used by Brain to skip lines it has
+already learned.
+"""
+
+from hashlib import md5
+
+FINGERPRINT_SIZE = 8
+
+def fingerprint(data):
+    """
+    Returns fingerprint of byte string: first FINGERPRINT_SIZE bytes of md5.
+    """
+    return md5(data).digest()[:FINGERPRINT_SIZE]
+
+class FingerprintSet:
+    """
+    Exact set of fingerprints, stored in model extras.
+
+    Fingerprints are saved incrementally: each save() writes only ones
+    added since previous save, as new chunk of concatenated fingerprints
+    (extra 'NAME.N'; extra 'NAME' holds number of chunks). Chunk that is not
+    smaller than previous one is merged into it, so there are at most
+    log2(n) chunks and every fingerprint is rewritten at most log2(n) times.
+    """
+
+    def __init__(self, model, name):
+        self.model = model
+        self.name = name
+        self._set = set()
+        self._unsaved = []
+        self._chunk_sizes = []
+
+        for i in range(model.get_extra(name) or 0):
+            chunk = model.get_extra(self._chunk_name(i))
+            self._chunk_sizes.append(len(chunk))
+            for pos in range(0, len(chunk), FINGERPRINT_SIZE):
+                self._set.add(chunk[pos:pos+FINGERPRINT_SIZE])
+
+    def _chunk_name(self, i):
+        return '%s.%d' % (self.name, i)
+
+    def __contains__(self, item):
+        return item in self._set
+
+    def __len__(self):
+        return len(self._set)
+
+    def add(self, item):
+        assert(len(item) == FINGERPRINT_SIZE)
+        if item not in self._set:
+            self._set.add(item)
+            self._unsaved.append(item)
+
+    def save(self):
+        """
+        Writes fingerprints added since last save to model.
+        """
+        if not self._unsaved:
+            return
+        chunk = ''.join(self._unsaved)
+        self._unsaved = []
+
+        sizes = self._chunk_sizes
+        while sizes and len(chunk) >= sizes[-1]:
+            previous = self.model.get_extra(self._chunk_name(len(sizes)-1))
+            chunk = previous + chunk
+            sizes.pop()
+        self.model.set_extra(self._chunk_name(len(sizes)), chunk)
+        sizes.append(len(chunk))
+        self.model.set_extra(self.name, len(sizes))
@@ -1,4 +1,6 @@
 
+from dadacore.stats import ModelStats
+
 class SequenceTooShortException(Exception):
     pass
 
@@ -28,16 +30,89 @@ class AbstractModel:
         Returns list of words, each word is string.
         """
 
+    def generate_random_many(self, count):
+        """
+        Generate list of count random sequences, see generate_random().
+        Engines may override it to fetch data for all sequences in batches.
+        """
+        return [ self.generate_random() for i in range(count) ]
+
     def generate_from_word(self, word):
         """
         Generate sequence containing specified word.
         """
 
+    def iter_roots(self):
+        """
+        Iterate over all root entries of model without loading whole model
+        into memory. Yields tuples (word, direction, variants). Word is None
+        for terminator, direction is 'f' or 'b' and variants is dict mapping
+        middle tuples (always in natural word order) to successors: single
+        word, list of words or None.
+        """
+
+    def get_root(self, word, direction):
+        """
+        Returns variants dict of root entry, as yielded by iter_roots().
+        Raises KeyError if there is no such entry.
+        """
+
+    def store_root(self, word, direction, variants):
+        """
+        Store root entry, replacing existing one. Variants dict is in format
+        returned by get_root().
+        """
+
+    def get_extra(self, name):
+        """
+        Returns auxiliary data stored alongside model under given name (such
+        as fingerprints of learned lines), or None if there is none.
+        """
+        return None
+
+    def set_extra(self, name, value):
+        """
+        Stores picklable auxiliary data alongside model. It is written to
+        permanent storage on sync().
+        """
+
+    def stats(self, top=10):
+        """
+        Collects ModelStats in one pass over iter_roots(). Top is number of
+        largest root entries to report.
+        """
+        stats = ModelStats(top)
+        for word, direction, variants in self.iter_roots():
+            stats.add_root(word, direction, variants)
+        return stats
+
+    def cache_info(self):
+        """
+        Returns dict describing state of engine's cache, or None if engine
+        does not cache. It is only meaningful in process serving the model
+        (iter_roots() and so stats() bypass cache).
+        """
+        return None
+
+    def store_roots(self, entries):
+        """
+        Store list of root entries (word, direction, variants) at once, see
+        store_root(). Engines may override it to write entries in batch.
+        """
+        for word, direction, variants in entries:
+            self.store_root(word, direction, variants)
+
     def sync(self):
         """
         Write cached data in memory to permanent storage
         """
 
+    def pack(self):
+        """
+        Reclaim space in permanent storage left by overwritten data, if
+        storage engine supports it.
+        """
+
     def __del__(self):
         self.sync()
 
@@ -46,8 +121,10 @@ def createModel(type, *pargs, **kwargs):
     Instantiate model of given type. Returns created model.
 
     Available types:
-     * berkeley_db
+     * shelve
      * zodb
+     * tcdb
+     * sharded
 
     """
     if type not in models:
@@ -67,8 +144,13 @@ def _createTcdbModel(*pargs, **kwargs):
     from dadacore.engines.tcdb import TcdbModel
     return TcdbModel(*pargs, **kwargs)
 
+def _createShardedModel(*pargs, **kwargs):
+    from dadacore.engines.sharded import ShardedModel
+    return ShardedModel(*pargs, **kwargs)
+
 models = {
     'shelve': _createShelveModel,
     'zodb': _createZodbModel,
     'tcdb': _createTcdbModel,
+    'sharded': _createShardedModel,
 }
\ No newline at end of file
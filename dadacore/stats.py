@@ -0,0 +1,115 @@
+"""
+Model introspection: sizes and fan-out of root entries, collected in one
+streaming pass over model (see AbstractModel.stats()).
+"""
+
+import heapq
+try:
+    from cPickle import dumps
+except ImportError:
+    from pickle import dumps
+from dadacore.compact import successors_list
+
+def _bucket(n):
+    """
+    Histogram bucket for n: largest power of two not greater than n (0 for 0).
+    """
+    bucket = 1
+    while bucket * 2 <= n:
+        bucket *= 2
+    return bucket if n else 0
+
+class ModelStats:
+    """
+    Statistics of model. Sizes are sizes of root entries pickled the way
+    shelve stores them, so they are estimates for other engines.
+    """
+
+    def __init__(self, top=10):
+        self.top = top
+        self.roots = 0
+        self.contexts = 0
+        self.transitions = 0
+        self.bytes = 0
+        self.middles_per_root = {}
+        self.successors_per_context = {}
+        self.largest_roots = []
+        self._vocabulary = set()
+
+    def add_root(self, word, direction, variants):
+        """
+        Accounts one root entry, in format yielded by
+        AbstractModel.iter_roots().
+        """
+        self.roots += 1
+        self.contexts += len(variants)
+        self._count(self.middles_per_root, len(variants))
+        self._vocabulary.add(word)
+
+        for middle, rightmost_variants in variants.iteritems():
+            successors = successors_list(rightmost_variants)
+            self.transitions += len(successors)
+            self._count(self.successors_per_context, len(successors))
+            self._vocabulary.update(middle)
+            self._vocabulary.update(successors)
+
+        size = len(dumps(variants))
+        self.bytes += size
+        entry = (size, word, direction)
+        if len(self.largest_roots) < self.top:
+            heapq.heappush(self.largest_roots, entry)
+        else:
+            heapq.heappushpop(self.largest_roots, entry)
+
+    @staticmethod
+    def _count(histogram, n):
+        bucket = _bucket(n)
+        histogram[bucket] = histogram.get(bucket, 0) + 1
+
+    @property
+    def vocabulary_size(self):
+        """Number of distinct words, terminator not counted"""
+        return len(self._vocabulary - set([None]))
+
+    @property
+    def bytes_per_transition(self):
+        if not self.transitions:
+            return 0.0
+        return float(self.bytes) / self.transitions
+
+    def top_roots(self):
+        """
+        Returns list of (size, word, direction) of largest root entries,
+        largest first.
+        """
+        return sorted(self.largest_roots, reverse=True)
+
+    def report(self):
+        """
+        Returns human-readable report as list of lines.
+        """
+        lines = [
+            "root keys:            %d" % self.roots,
+            "contexts:             %d" % self.contexts,
+            "transitions:          %d" % self.transitions,
+            "vocabulary:           %d" % self.vocabulary_size,
+            "serialized bytes:     %d" % self.bytes,
+            "bytes per transition: %.1f" % self.bytes_per_transition,
+        ]
+
+        for title, histogram in (
+                ("middles per root", self.middles_per_root),
+                ("successors per context", self.successors_per_context)):
+            lines.append("%s:" % title)
+            for bucket in sorted(histogram):
+                lines.append("  %8s %d" % (
+                    "%d-%d" % (bucket, max(bucket*2-1, bucket)),
+                    histogram[bucket]))
+
+        lines.append("largest roots:")
+        for size, word, direction in self.top_roots():
+            lines.append("  %10d %s %s" % (
+                size, direction,
+                "(terminator)" if word is None
+                    else repr(word.encode('utf-8'))))
+        return lines
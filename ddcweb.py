@@ -1,7 +1,13 @@
 #! /usr/bin/env python
 from __future__ import with_statement
+from atexit import register as atexit_register
+from itertools import chain
 from sys import exc_info
 from threading import Lock
+try:
+    import json
+except ImportError:
+    import simplejson as json
 import web
 from dadacore.model import createModel, SequenceTooShortException, \
     StartWordException
@@ -12,8 +18,16 @@ urls = (
   '/reply_to_line', 'reply_to_line',
   '/api/random', 'api_random',
   '/api/reply_to_line', 'api_reply_to_line',
+  '/api/batch_random', 'api_batch_random',
+  '/api/batch_reply', 'api_batch_reply',
+  '/api/cache_info', 'api_cache_info',
 )
 
+# Maximum number of lines or random replies in one batch request
+BATCH_MAX = 1000
+# Number of lines processed under one lock acquisition in streaming mode
+BATCH_STREAM_CHUNK = 50
+
 render = web.template.render('templates/')
 
 brain_lock = Lock()
@@ -22,6 +36,13 @@ with brain_lock:
 
     brain = Brain(mmodel)
 
+def sync_brain():
+    with brain_lock:
+        brain.sync()
+
+# Saves fingerprints of lines learned since last sync
+atexit_register(sync_brain)
+
 brainlog = open("brain.log", "a")
 
 class index:
@@ -39,13 +60,16 @@ class index:
         input = web.input()
 
         for line in input.learntext.split("\n"):
-            brainlog.write("%s\n" % line.strip().encode('utf-8'))
-            brainlog.flush()
             try:
                 with brain_lock:
-                    brain.learn(line)
+                    learned = brain.learn(line)
             except SequenceTooShortException:
-                pass
+                learned = True
+
+            # Lines skipped as already learned are not logged
+            if learned:
+                brainlog.write("%s\n" % line.strip().encode('utf-8'))
+                brainlog.flush()
 
         with brain_lock:
             brain.sync()
@@ -80,10 +104,10 @@ class api_reply_to_line:
             line = brain.generate_from_phrase(srcline)
             if get_params.learn:
                 try:
-                    brain.learn(srcline)
-                    # todo: make brainlog class or move logging to brain
-                    brainlog.write("%s\n" % line.strip().encode('utf-8'))
-                    brainlog.flush()
+                    if brain.learn(srcline):
+                        # todo: make brainlog class or move logging to brain
+                        brainlog.write("%s\n" % line.strip().encode('utf-8'))
+                        brainlog.flush()
 
                 except SequenceTooShortException:
                     pass
@@ -91,7 +115,126 @@ class api_reply_to_line:
         web.header("Content-type", "text/plain; charset=utf-8")
         return line
 
+def batch_flag(value):
+    """
+    Parses boolean param of batch API: '1' or 'true' enables it.
+    """
+    return value is not None and value.lower() in ('1', 'true')
+
+def batch_params():
+    """
+    Returns request params for batch API. Lines to reply are given either
+    as repeated 'line' params or as newline-separated 'lines' param.
+    """
+    params = web.input(line=[], lines='', count='1', learn=None, stream=None)
+    params.learn = batch_flag(params.learn)
+    params.stream = batch_flag(params.stream)
+    params.line = list(params.line)
+    params.line.extend(line for line in params.lines.split("\n")
+                       if line.strip())
+    if len(params.line) > BATCH_MAX:
+        raise web.badrequest()
+    return params
+
+def batch_chunks(items, stream, process):
+    """
+    Splits items into chunks and yields process(chunk) for each chunk under
+    brain lock. Without streaming all items are processed as one chunk.
+    """
+    chunk_size = BATCH_STREAM_CHUNK if stream else max(len(items), 1)
+    for i in range(0, len(items), chunk_size):
+        with brain_lock:
+            results = process(items[i:i+chunk_size])
+        yield results
+
+def json_list_response(chunks, stream):
+    """
+    Returns JSON list of results from all chunks. In streaming mode list is
+    sent to client as chunks are produced; first chunk is still produced
+    here, so errors like empty brain are reported before streaming starts.
+    If brain is empty, returns JSON object with error instead.
+    """
+    web.header("Content-type", "application/json; charset=utf-8")
+    try:
+        if not stream:
+            results = []
+            for chunk in chunks:
+                results.extend(chunk)
+            return json.dumps(results)
+
+        chunks = iter(chunks)
+        first_chunk = next(chunks, [])
+    except BrainIsEmptyException:
+        web.ctx.status = '503 Service Unavailable'
+        return json.dumps({'error': "Brain is empty"})
+    return json_list_stream(first_chunk, chunks)
+
+def json_list_stream(first_chunk, chunks):
+    separator = ''
+    yield '['
+    for chunk in chain([first_chunk], chunks):
+        for result in chunk:
+            yield separator + json.dumps(result)
+            separator = ','
+    yield ']'
+
+def learn_lines(lines):
+    """
+    Learns lines and writes them to brain log, except ones skipped as
+    already learned. Brain lock must be held.
+    """
+    for line in lines:
+        try:
+            if brain.learn(line):
+                brainlog.write("%s\n" % line.strip().encode('utf-8'))
+        except SequenceTooShortException:
+            pass
+    brainlog.flush()
+
+class api_batch_random:
+    def GET(self):
+        params = batch_params()
+        try:
+            count = int(params.count)
+        except ValueError:
+            raise web.badrequest()
+        if not 0 < count <= BATCH_MAX:
+            raise web.badrequest()
+
+        return json_list_response(
+            batch_chunks(range(count), params.stream,
+                         lambda chunk: brain.generate_random_many(len(chunk))),
+            params.stream)
+
+    POST = GET
+
+class api_batch_reply:
+    def GET(self):
+        params = batch_params()
+
+        def reply(lines):
+            # Lines are learned even if brain is empty and replying fails
+            try:
+                return brain.generate_from_phrases(lines)
+            finally:
+                if params.learn:
+                    learn_lines(lines)
+
+        return json_list_response(
+            batch_chunks(params.line, params.stream, reply), params.stream)
+
+    POST = GET
+
+# Model's cache_info() as JSON (null if engine does not cache). Cache residency
+# is only meaningful here, in process serving requests.
+class api_cache_info:
+    def GET(self):
+        with brain_lock:
+            info = brain.model.cache_info()
+        web.header("Content-type", "application/json; charset=utf-8")
+        return json.dumps(info)
+
 app = web.application(urls, globals())
 
 if __name__ == "__main__":
-    app.run()
\ No newline at end of file
+    app.run()
@@ -0,0 +1,67 @@
+#! /usr/bin/env python
+"""
+Dumps model to engine-agnostic file or loads it back, possibly into model of
+other type:
+
+  model_dump.py dump -t shelve markovdb model.dump.gz
+  model_dump.py load -t zodb markovdb.fs model.dump.gz
+
+Use '-' as dump filename for stdout/stdin.
+
+Load stores dump in chunks; chunks are written in parallel only by sharded
+model (each chunk is spread over all shards at once). Shelve, tcdb and zodb
+models are single files with one writer, so they are loaded sequentially.
+"""
+
+import gzip
+from glob import glob
+from optparse import OptionParser
+from sys import exit, stderr, stdin, stdout
+from dadacore.model import createModel
+from dadacore.dump import dump_model, load_model, read_header
+
+def open_dump(filename, mode):
+    if filename == '-':
+        return stdout if mode == 'w' else stdin
+    if filename.endswith('.gz'):
+        return gzip.open(filename, mode + 'b')
+    return open(filename, mode + 'b')
+
+def main():
+    parser = OptionParser(
+        usage="%prog dump|load [options] MODEL DUMPFILE",
+        description="Dumps model to engine-agnostic file or loads it back. "
+                    "Load is parallel only for sharded model, other engines "
+                    "are loaded sequentially.")
+    parser.add_option("-t", "--type", default="shelve",
+                      help="model type [default: %default]")
+    options, args = parser.parse_args()
+    if len(args) != 3 or args[0] not in ('dump', 'load'):
+        parser.error("command, MODEL and DUMPFILE required")
+    command, model_filename, dump_filename = args
+
+    kwargs = {}
+    if options.type == 'shelve':
+        # Model is read or written in one pass, prefetching is useless
+        kwargs['warm_up'] = False
+
+    if command == 'dump':
+        model = createModel(options.type, filename=model_filename, **kwargs)
+        fileobj = open_dump(dump_filename, 'w')
+        count = dump_model(model, fileobj)
+    else:
+        if glob(model_filename) or glob(model_filename + '.*'):
+            stderr.write("%s already exists\n" % model_filename)
+            exit(1)
+        fileobj = open_dump(dump_filename, 'r')
+        header = read_header(fileobj)
+        model = createModel(options.type, filename=model_filename,
+                            order=header['order'], **kwargs)
+        count = load_model(fileobj, model)
+        model.pack()
+
+    fileobj.close()
+    stderr.write("%d root entries %sed\n" % (count, command))
+
+if __name__ == "__main__":
+    main()
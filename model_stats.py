@@ -0,0 +1,34 @@
+#! /usr/bin/env python
+"""
+Prints statistics of model database: root key count, fan-out histograms,
+largest root entries and so on. Cache residency of running server is served
+by ddcweb.py at /api/cache_info.
+"""
+
+from optparse import OptionParser
+from dadacore.model import createModel
+
+def main():
+    parser = OptionParser(usage="%prog [options] [FILENAME]")
+    parser.add_option("-t", "--type", default="shelve",
+                      help="model type [default: %default]")
+    parser.add_option("-n", "--top", type="int", default=10,
+                      help="number of largest root entries to show "
+                           "[default: %default]")
+    options, args = parser.parse_args()
+    if len(args) > 1:
+        parser.error("too many arguments")
+
+    kwargs = {}
+    if args:
+        kwargs['filename'] = args[0]
+    if options.type == 'shelve':
+        # Stats are read bypassing cache, prefetching it is useless
+        kwargs['warm_up'] = False
+    model = createModel(options.type, **kwargs)
+
+    for line in model.stats(options.top).report():
+        print line
+
+if __name__ == "__main__":
+    main()
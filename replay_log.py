@@ -14,6 +14,7 @@ def main():
         except SequenceTooShortException:
             pass
     stderr.write("\n")
+    stderr.write("%d duplicate lines skipped\n" % br.skipped_lines)
     br.sync()
 
 if __name__ == "__main__":
@@ -0,0 +1,29 @@
+#! /usr/bin/env python
+"""
+Serves one shard of sharded model over network. Connect to it with
+createModel('sharded', addresses=[(host, port), ...], authkey=...).
+"""
+
+from optparse import OptionParser
+from dadacore.engines.sharded import serve_shard_forever
+
+def main():
+    parser = OptionParser(usage="%prog [options] FILENAME")
+    parser.add_option("--host", default="localhost",
+                      help="address to listen on [default: %default]")
+    parser.add_option("--port", type="int", default=7301,
+                      help="port to listen on [default: %default]")
+    parser.add_option("--authkey", default=None,
+                      help="shared secret clients must know (required)")
+    options, args = parser.parse_args()
+    if len(args) != 1:
+        parser.error("FILENAME required")
+    if not options.authkey:
+        parser.error("--authkey required: unauthenticated clients could run "
+                     "arbitrary code")
+
+    serve_shard_forever((options.host, options.port), args[0],
+                        authkey=options.authkey)
+
+if __name__ == "__main__":
+    main()
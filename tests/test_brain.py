@@ -0,0 +1,66 @@
+import random
+import unittest
+from dadacore.brain import Brain, BrainIsEmptyException
+from dadacore.engines.keyvalue import KeyValueModel
+
+class DictProxy(dict):
+    def sync(self):
+        pass
+
+LINES = [
+    u"one two three four five six",
+    u"alpha beta gamma delta epsilon zeta",
+    u"red green blue cyan magenta yellow black",
+]
+
+class RecordingBrain(Brain):
+    """
+    Brain with fake random replies, numbered in order of generation.
+    """
+    def generate_random_many(self, count):
+        self.random_counts.append(count)
+        return [ "random %d" % i for i in range(count) ]
+
+class BrainBatchTest(unittest.TestCase):
+    def _replies(self, brain):
+        return set(brain._words_to_string_with_caps(
+                       brain._string_to_words(line)) for line in LINES)
+
+    def test_generate_random_many(self):
+        brain = Brain(KeyValueModel(DictProxy()))
+        for line in LINES:
+            brain.learn(line)
+
+        random.seed(1)
+        replies = brain.generate_random_many(30)
+        self.assertEqual(len(replies), 30)
+        # Lines share no windows, so lockstep walks can only repeat them
+        for reply in replies:
+            self.assert_(reply in self._replies(brain), reply)
+        self.assertEqual(set(replies), self._replies(brain))
+
+    def test_generate_random_many_empty(self):
+        brain = Brain(KeyValueModel(DictProxy()))
+        self.assertRaises(BrainIsEmptyException,
+                          brain.generate_random_many, 3)
+
+    def test_generate_from_phrases(self):
+        brain = RecordingBrain(KeyValueModel(DictProxy()))
+        brain.random_counts = []
+        for line in LINES:
+            brain.learn(line)
+
+        replies = brain.generate_from_phrases(
+            [u"unknown", u"alpha", u"nothing here", u"magenta", u"zzz"])
+        self.assertEqual(replies, [
+            "random 0",
+            "Alpha beta gamma delta epsilon zeta.",
+            "random 1",
+            "Red green blue cyan magenta yellow black.",
+            "random 2",
+        ])
+        # Fallback replies are generated in one batch
+        self.assertEqual(brain.random_counts, [3])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+import random
+import shutil
+import signal
+import tempfile
+import unittest
+from os import path
+from dadacore import model
+from dadacore.compact import compact_model
+from dadacore.engines.shelvedb import ShelveModel
+
+WORDS = (u"the cat sat on a mat and dog ran to big red house with small blue "
+         "door under old tree near green river").split()
+
+class CompactModelTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.source = ShelveModel(path.join(self.dir, 'source'), warm_up=False)
+        self.models = [self.source]
+
+        rnd = random.Random(1)
+        for i in range(300):
+            # Skewed choice, so some words are rare
+            self.source.learn([ WORDS[int(rnd.paretovariate(1.2)) % len(WORDS)]
+                                for j in range(rnd.randint(5, 12)) ])
+        self.source.sync()
+
+    def tearDown(self):
+        # Models write their files when collected
+        del self.source
+        del self.models[:]
+        shutil.rmtree(self.dir)
+
+    def _model(self, name, order=None):
+        model = ShelveModel(path.join(self.dir, name), order=order,
+                            warm_up=False)
+        self.models.append(model)
+        return model
+
+    def _compact(self, name='dest', source=None, **kwargs):
+        if source is None:
+            source = self.source
+        dest = self._model(name, order=source.order)
+        stats = compact_model(source, dest, **kwargs)
+        return dest, stats
+
+    def _assert_generates(self, model):
+        # Generation stuck in cycle would never return
+        signal.signal(signal.SIGALRM, _timeout)
+        signal.alarm(10)
+        try:
+            random.seed(2)
+            for i in range(300):
+                model.generate_random()
+            for word, direction, variants in list(model.iter_roots()):
+                if word is not None:
+                    model.generate_from_word(word)
+        finally:
+            signal.alarm(0)
+
+    def test_copy(self):
+        dest, stats = self._compact()
+        self.assertEqual(stats.windows_dropped, 0)
+        self.assertEqual(stats.transitions_read, stats.transitions_written)
+        self.assertEqual(sorted(self.source.iter_roots()),
+                         sorted(dest.iter_roots()))
+
+    def test_min_contexts(self):
+        for min_contexts in (5, 20, 30):
+            dest, stats = self._compact('dest%d' % min_contexts,
+                                        min_contexts=min_contexts)
+            self.assert_(stats.windows_dropped > 0)
+            self._assert_generates(dest)
+
+    def test_drop_dead_ends(self):
+        dest, stats = self._compact(min_contexts=20, drop_dead_ends=True)
+        self._assert_generates(dest)
+
+    def test_cycle_without_terminator(self):
+        source = self._model('cycle', order=2)
+        source.learn(u"a b a b c".split())
+        # "c" is rare, so cycle "a b a b ..." loses its only way to terminator
+        dest, stats = self._compact(source=source, min_contexts=2)
+        self.assertEqual(list(dest.iter_roots()), [])
+        self.assertRaises(model.NoSuchWordException, dest.generate_random)
+
+        source.learn(u"a b a".split())
+        dest, stats = self._compact('dest2', source=source, min_contexts=2)
+        self.assertEqual(stats.windows_dropped, 2)
+        self._assert_generates(dest)
+
+def _timeout(signum, frame):
+    raise AssertionError("Generation did not finish")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+import shutil
+import tempfile
+import unittest
+from os import path
+from StringIO import StringIO
+from dadacore.dump import DumpFormatException, dump_model, load_model, \
+    read_header
+from dadacore.engines.shelvedb import ShelveModel
+
+LINES = [
+    u"the cat sat on the mat",
+    u"the cat ran to the big red house",
+    u"кот сидел на ковре и смотрел на the cat",
+]
+
+class DumpTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.models = []
+
+    def tearDown(self):
+        # Models write their files when collected
+        del self.models[:]
+        shutil.rmtree(self.dir)
+
+    def _model(self, name, order=None):
+        model = ShelveModel(path.join(self.dir, name), order=order,
+                            warm_up=False)
+        self.models.append(model)
+        return model
+
+    def test_round_trip(self):
+        source = self._model('source', order=2)
+        for line in LINES:
+            source.learn(line.split())
+        source.sync()
+
+        roots = sorted(source.iter_roots())
+        values = [ value for word, direction, variants in roots
+                   for value in variants.values() ]
+        self.assert_(None in values)
+        self.assert_([ value for value in values if isinstance(value, list) ])
+
+        dump = StringIO()
+        self.assertEqual(dump_model(source, dump), len(roots))
+
+        dump.seek(0)
+        header = read_header(dump)
+        self.assertEqual(header['order'], 2)
+        dest = self._model('dest', order=header['order'])
+        self.assertEqual(load_model(dump, dest, chunk_size=3), len(roots))
+        self.assertEqual(sorted(dest.iter_roots()), roots)
+
+    def test_bad_header(self):
+        for header in ('not json\n',
+                       '[1, 2]\n',
+                       '{"format": "other", "version": 1, "order": 2}\n',
+                       '{"format": "dadacore-dump", "version": 2, '
+                       '"order": 2}\n'):
+            self.assertRaises(DumpFormatException, read_header,
+                              StringIO(header))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import unittest
+from dadacore.brain import Brain
+from dadacore.engines.keyvalue import KeyValueModel
+from dadacore.fingerprint import FingerprintSet, fingerprint
+
+class DictProxy(dict):
+    def sync(self):
+        pass
+
+class FingerprintSetTest(unittest.TestCase):
+    def setUp(self):
+        self.model = KeyValueModel(DictProxy())
+
+    def test_saved_incrementally(self):
+        fingerprints = FingerprintSet(self.model, 'fp')
+        items = [ fingerprint(str(i)) for i in range(100) ]
+        for i, item in enumerate(items):
+            fingerprints.add(item)
+            fingerprints.save()
+            # Chunks are merged, so their count stays logarithmic
+            self.assert_(self.model.get_extra('fp') <= 7)
+
+        loaded = FingerprintSet(self.model, 'fp')
+        self.assertEqual(len(loaded), 100)
+        for item in items:
+            self.assert_(item in loaded)
+        self.failIf(fingerprint('100') in loaded)
+
+    def test_save_without_changes(self):
+        fingerprints = FingerprintSet(self.model, 'fp')
+        fingerprints.save()
+        self.assertEqual(self.model.get_extra('fp'), None)
+
+class BrainFingerprintsTest(unittest.TestCase):
+    LINE = u"one two three four five six"
+
+    def test_skips_learned_lines(self):
+        model = KeyValueModel(DictProxy())
+        brain = Brain(model)
+        self.assertEqual(brain.learn(self.LINE), True)
+        self.assertEqual(brain.learn(u"One  TWO three four five six"), False)
+        self.assertEqual(brain.skipped_lines, 1)
+        brain.sync()
+
+        brain = Brain(model)
+        self.assertEqual(brain.learn(self.LINE), False)
+        self.assertEqual(brain.learn(self.LINE + u" seven"), True)
+
+    def test_disabled(self):
+        brain = Brain(KeyValueModel(DictProxy()), fingerprints=False)
+        self.assertEqual(brain.learn(self.LINE), True)
+        self.assertEqual(brain.learn(self.LINE), True)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+import atexit
+import unittest
+from multiprocessing import Pipe
+from threading import Thread
+from zlib import crc32
+from dadacore.engines.keyvalue import KeyValueModel
+from dadacore.engines import sharded
+from dadacore.engines.sharded import ShardedModel, ShardedProxy, \
+    LocalShard, ConnectionShard, serve_shard
+
+LINES = [
+    u"the quick brown fox jumps over lazy dog",
+    u"one two three four five six seven",
+    u"alpha beta gamma delta epsilon zeta",
+    u"red green blue cyan magenta yellow black white",
+]
+
+class DictProxy(dict):
+    """In-memory proxy for shards and models"""
+    def sync(self):
+        pass
+
+class ShardedModelTest(unittest.TestCase):
+    SHARDS = 3
+
+    def setUp(self):
+        self.proxies = [ DictProxy() for i in range(self.SHARDS) ]
+        self.model = ShardedModel(
+            shards=[ LocalShard(proxy) for proxy in self.proxies ])
+        for line in LINES:
+            self.model.learn(line.split())
+
+    def test_routing(self):
+        for index, proxy in enumerate(self.proxies):
+            self.assert_(proxy)
+            for key in proxy:
+                self.assertEqual((crc32(key) & 0xffffffff) % self.SHARDS,
+                                 index)
+
+    def test_same_as_unsharded(self):
+        plain = KeyValueModel(DictProxy())
+        for line in LINES:
+            plain.learn(line.split())
+        self.assertEqual(sorted(self.model.iter_roots()),
+                         sorted(plain.iter_roots()))
+
+    def test_add_transitions_merges_on_shard(self):
+        key = KeyValueModel._root_key(u'x', 'f')
+        middle = (u'a', u'b', u'c')
+        self.model.db.add_transitions([(key, middle, u'd')])
+        self.model.db.add_transitions([(key, middle, u'e'),
+                                       (key, middle, u'd')])
+        proxy = self.proxies[(crc32(key) & 0xffffffff) % self.SHARDS]
+        self.assertEqual(proxy[key], {middle: [u'd', u'e']})
+
+    def test_generate_random_many(self):
+        # Lines share no words, so generation can only repeat them
+        replies = self.model.generate_random_many(20)
+        self.assertEqual(len(replies), 20)
+        for reply in replies:
+            self.assert_(u" ".join(reply) in LINES)
+        self.assertEqual(self.model.generate_random_many(0), [])
+
+    def test_open_models(self):
+        handlers = len(atexit._exithandlers)
+        open_models = len(sharded._open_models)
+        models = [ ShardedModel(shards=[LocalShard(DictProxy())])
+                   for i in range(3) ]
+        # One exit hook closes all models still open
+        self.assertEqual(len(atexit._exithandlers), handlers)
+        self.assertEqual(len(sharded._open_models), open_models + 3)
+
+        models[0].close()
+        self.failIf(models[0] in sharded._open_models)
+        del models[:]
+        self.assertEqual(len(sharded._open_models), open_models)
+
+class CallAllErrorTest(unittest.TestCase):
+    def _check_drained(self, shards):
+        proxy = ShardedProxy(shards)
+        self.assertRaises(ValueError, proxy._call_all,
+                          [(0, 'no_such_op', ()), (1, 'keys', ())])
+        # Reply to 'keys' must not be taken as reply to this request
+        self.assertEqual(shards[1].call('has_key', '>x'), False)
+        proxy['>x'] = {}
+        self.assertEqual(proxy.has_key('>x'), True)
+
+    def test_local_shards(self):
+        shards = [ LocalShard(DictProxy()), LocalShard(DictProxy()) ]
+        self._check_drained(shards)
+        self.assertEqual(shards[1]._replies, [])
+
+    def test_connection_shards(self):
+        shards = []
+        for i in range(2):
+            conn, server_conn = Pipe()
+            thread = Thread(target=serve_shard,
+                            args=(server_conn, DictProxy()))
+            thread.setDaemon(True)
+            thread.start()
+            shards.append(ConnectionShard(conn))
+        self._check_drained(shards)
+        for shard in shards:
+            shard.close()
+
+if __name__ == '__main__':
+    unittest.main()
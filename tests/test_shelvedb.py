@@ -0,0 +1,84 @@
+import shutil
+import tempfile
+import unittest
+from os import path
+from dadacore.engines.shelvedb import ShelveModel, ShelveProxy
+
+class RecordingDict(dict):
+    """
+    Stand-in for shelve that records written keys.
+    """
+    def __init__(self, *pargs):
+        dict.__init__(self, *pargs)
+        self.written = []
+
+    def __setitem__(self, key, value):
+        self.written.append(key)
+        dict.__setitem__(self, key, value)
+
+class HotKeysTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.filename = path.join(self.dir, 'model')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_prefetch_after_reopen(self):
+        model = ShelveModel(self.filename, order=2)
+        model.learn(u"one two three four".split())
+        model.learn(u"one two five six".split())
+        model.sync()
+        del model
+
+        model = ShelveModel(self.filename, warm_up=False)
+        for i in range(3):
+            model.get_root(u'two', 'f')
+        model.get_root(u'one', 'f')
+        model.sync()
+        hot_keys = model.db.hot_keys()
+        self.assertEqual(hot_keys[:2], ['>two', '>one'])
+        del model
+
+        model = ShelveModel(self.filename, warm_up=False)
+        self.assertEqual(model.cache_info()['keys'], 0)
+        del model
+
+        model = ShelveModel(self.filename)
+        self.assertEqual(sorted(key for key in model.db._cache.keys()
+                                if not key.startswith('.')),
+                         sorted(hot_keys))
+        # Prefetched values are not counted as hits
+        self.assertEqual([ valueobj.hits
+                           for key, valueobj in model.db._cache.items()
+                           if key in hot_keys ],
+                         [0] * len(hot_keys))
+        del model
+
+    def test_size_breaks_ties(self):
+        proxy = ShelveProxy(self.filename)
+        proxy['big'] = range(100)
+        proxy['small'] = [1]
+        self.assertEqual(proxy.hot_keys(), ['small', 'big'])
+
+    def test_unchanged_hot_keys_not_rewritten(self):
+        proxy = ShelveProxy(self.filename)
+        proxy['a'] = 1
+        proxy['b'] = 2
+        proxy['a']
+        proxy.sync()
+        self.assertEqual(proxy._saved_hot_keys, ['a', 'b'])
+
+        proxy._s = RecordingDict(proxy._s)
+        proxy['a']
+        proxy.sync()
+        self.assertEqual(proxy._s.written, [])
+
+        for i in range(3):
+            proxy['b']
+        proxy.sync()
+        self.assertEqual(proxy._s.written, [ShelveProxy.HOT_KEYS_KEY])
+        self.assertEqual(proxy._saved_hot_keys, ['b', 'a'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+import unittest
+from dadacore.engines.keyvalue import KeyValueModel
+from dadacore.stats import ModelStats
+
+class DictProxy(dict):
+    def sync(self):
+        pass
+
+class ModelStatsTest(unittest.TestCase):
+    def setUp(self):
+        self.model = KeyValueModel(DictProxy(), order=2)
+        self.model.store_root(None, 'f', {(u'a',): u'b'})
+        self.model.store_root(u'a', 'f', {(u'b',): [u'c', u'd', None],
+                                          (u'c',): None})
+        self.model.store_root(u'b', 'b', {(u'a',): [u'x', u'y'],
+                                          (u'c',): u'a',
+                                          (u'd',): u'a'})
+        self.stats = self.model.stats(top=2)
+
+    def test_counts(self):
+        self.assertEqual(self.stats.roots, 3)
+        self.assertEqual(self.stats.contexts, 6)
+        self.assertEqual(self.stats.transitions, 9)
+        # a b c d x y
+        self.assertEqual(self.stats.vocabulary_size, 6)
+        self.assert_(self.stats.bytes > 0)
+        self.assertEqual(self.stats.bytes_per_transition,
+                         self.stats.bytes / 9.0)
+
+    def test_histograms(self):
+        self.assertEqual(self.stats.middles_per_root, {1: 1, 2: 2})
+        self.assertEqual(self.stats.successors_per_context, {1: 4, 2: 2})
+
+    def test_top_roots(self):
+        top = self.stats.top_roots()
+        self.assertEqual([ (word, direction) for size, word, direction in top ],
+                         [(u'b', 'b'), (u'a', 'f')])
+        self.assert_(top[0][0] >= top[1][0])
+
+    def test_report(self):
+        report = ModelStats().report()
+        self.assert_("root keys:            0" in report)
+
+if __name__ == '__main__':
+    unittest.main()